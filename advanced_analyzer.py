@@ -1,15 +1,15 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr, spearmanr
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-import matplotlib.pyplot as plt
-import seaborn as sns
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.stats.diagnostic import het_breuschpagan
 import warnings
 warnings.filterwarnings('ignore')
 
+# Spearman come Pearson sui ranghi e p-value, condivisi con l'analisi base
+from correlation_stats import correlation_pvalues, spearman_fast, subset_ranks
+
+# Scrittura JSON (orjson se disponibile)
+from json_io import dumps_json
+
+
 class AdvancedMLCSAnalysis:
     def __init__(self, analyzer):
         """
@@ -18,13 +18,73 @@ class AdvancedMLCSAnalysis:
         self.analyzer = analyzer
         self.lag_analysis_results = {}
         self.cross_project_results = {}
+        self._rank_cache = {}
+    
+    def _get_ranks(self, project_name, column):
+        """
+        Valori e ordinamento (NaN in coda) di una colonna, calcolati una sola volta per (progetto, colonna):
+        da qui subset_ranks ricava i ranghi di qualsiasi sottoinsieme di righe senza riordinare.
+        La cache ricorda il DataFrame aggregato da cui provengono: se aggregated_data[progetto] viene
+        sostituito (es. nuova finestra temporale) i ranghi vengono ricalcolati
+        """
+        data = self.analyzer.aggregated_data[project_name]
+        key = (project_name, column)
+        cached = self._rank_cache.get(key)
+        if cached is None or cached[0] is not data:
+            values = data[column].to_numpy(dtype=np.float64)
+            cached = (data, values, np.argsort(values, kind='stable'))
+            self._rank_cache[key] = cached
+        return cached[1:]
+    
+    def _rank_correlations(self, project_name, pairs, x_rows, y_rows, min_n):
+        """
+        Spearman di più coppie (x, y) allineando x[x_rows] con y[y_rows], sulle sole righe
+        in cui entrambe le serie sono valorizzate (maschera NaN congiunta per coppia).
+        Le coppie con la stessa maschera condividono i ranghi: una matrice e un solo corrcoef per maschera.
+        Restituisce {coppia: (r, p, n)} per le coppie con almeno min_n righe valide
+        """
+        groups = {}
+        for x_var, y_var in pairs:
+            valid = ~(np.isnan(self._get_ranks(project_name, x_var)[0][x_rows]) |
+                      np.isnan(self._get_ranks(project_name, y_var)[0][y_rows]))
+            if valid.sum() >= min_n:
+                groups.setdefault(valid.tobytes(), (valid, []))[1].append((x_var, y_var))
+        
+        results = {}
+        for valid, group_pairs in groups.values():
+            n = int(valid.sum())
+            x_mask = np.zeros(len(x_rows), dtype=bool)
+            y_mask = np.zeros(len(y_rows), dtype=bool)
+            x_mask[x_rows] = valid
+            y_mask[y_rows] = valid
+            
+            if len(group_pairs) == 1:
+                # Una sola coppia: il kernel per coppia evita di costruire la matrice
+                (x_var, y_var), = group_pairs
+                r_values = np.array([spearman_fast(subset_ranks(*self._get_ranks(project_name, x_var), x_mask),
+                                                   subset_ranks(*self._get_ranks(project_name, y_var), y_mask), n)])
+            else:
+                x_cols = list(dict.fromkeys(x_var for x_var, _ in group_pairs))
+                y_cols = list(dict.fromkeys(y_var for _, y_var in group_pairs))
+                rank_matrix = np.column_stack(
+                    [subset_ranks(*self._get_ranks(project_name, col), x_mask) for col in x_cols] +
+                    [subset_ranks(*self._get_ranks(project_name, col), y_mask) for col in y_cols])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    corr = np.corrcoef(rank_matrix, rowvar=False)
+                r_values = np.array([corr[x_cols.index(x_var), len(x_cols) + y_cols.index(y_var)]
+                                     for x_var, y_var in group_pairs])
+            
+            p_values = correlation_pvalues(r_values, n)
+            for pair, r, p in zip(group_pairs, r_values, p_values):
+                results[pair] = (r, p, n)
+        return results
         
     def lag_correlation_analysis(self, project_name, max_lag=3):
         """
         Analizza correlazioni con ritardo temporale
         Utile per capire se gli effetti si manifestano dopo qualche periodo
         """
-        data = self.analyzer.aggregated_data[project_name].copy()
+        data = self.analyzer.aggregated_data[project_name]
         
         print(f"\n=== LAG CORRELATION ANALYSIS - {project_name} ===")
         
@@ -33,42 +93,29 @@ class AdvancedMLCSAnalysis:
         target_vars = ['complexity_delta', 'change_intensity', 'bugfix_ratio']
         
         lag_results = {}
+        n_rows = len(data)
+        pairs = [(smell_var, target_var) for smell_var in smell_vars for target_var in target_vars
+                 if smell_var in data.columns and target_var in data.columns]
+        lag_correlations = {pair: [] for pair in pairs}
+        positions = np.arange(n_rows)
         
-        for smell_var in smell_vars:
-            for target_var in target_vars:
-                if smell_var in data.columns and target_var in data.columns:
-                    
-                    print(f"\n{smell_var} -> {target_var}")
-                    lag_correlations = []
-                    
-                    for lag in range(max_lag + 1):
-                        if lag == 0:
-                            # Correlazione contemporanea
-                            x = data[smell_var].dropna()
-                            y = data[target_var].dropna()
-                            
-                            # Allinea le serie
-                            min_len = min(len(x), len(y))
-                            if min_len > 3:
-                                r, p = spearmanr(x[:min_len], y[:min_len])
-                                lag_correlations.append((lag, r, p, min_len))
-                                print(f"  Lag {lag}: r={r:.3f}, p={p:.3f}")
-                        else:
-                            # Correlazione con ritardo
-                            x = data[smell_var].iloc[:-lag].dropna()
-                            y = data[target_var].iloc[lag:].dropna()
-                            
-                            min_len = min(len(x), len(y))
-                            if min_len > 3:
-                                # Riallinea gli indici
-                                x_aligned = x.iloc[:min_len].values
-                                y_aligned = y.iloc[:min_len].values
-                                
-                                r, p = spearmanr(x_aligned, y_aligned)
-                                lag_correlations.append((lag, r, p, min_len))
-                                print(f"  Lag {lag}: r={r:.3f}, p={p:.3f}")
-                    
-                    lag_results[f"{smell_var}_to_{target_var}"] = lag_correlations
+        for lag in range(max_lag + 1):
+            if n_rows - lag <= 3:
+                break
+            
+            # Allinea x(t) con y(t+lag)
+            lag_results_at = self._rank_correlations(project_name, pairs, positions < n_rows - lag,
+                                                     positions >= lag, min_n=4)
+            for pair in pairs:
+                if pair in lag_results_at:
+                    r, p, n = lag_results_at[pair]
+                    lag_correlations[pair].append((lag, r, p, n))
+        
+        for smell_var, target_var in pairs:
+            print(f"\n{smell_var} -> {target_var}")
+            for lag, r, p, n in lag_correlations[(smell_var, target_var)]:
+                print(f"  Lag {lag}: r={r:.3f}, p={p:.3f}")
+            lag_results[f"{smell_var}_to_{target_var}"] = lag_correlations[(smell_var, target_var)]
         
         self.lag_analysis_results[project_name] = lag_results
         return lag_results
@@ -80,61 +127,93 @@ class AdvancedMLCSAnalysis:
         """
         print("\n=== CROSS-PROJECT META-ANALYSIS ===")
         
-        all_correlations = []
+        categories = ['complexity', 'changes', 'bugfixes']
         
-        # Raccoglie tutte le correlazioni da tutti i progetti
+        # Primo passaggio: conta i test per preallocare le colonne
+        n_total = sum(
+            len(results[category])
+            for results in self.analyzer.correlation_results.values()
+            for category in categories if category in results
+        )
+        
+        if n_total == 0:
+            print("No correlation data available for meta-analysis")
+            return None
+        
+        projects = np.empty(n_total, dtype=object)
+        row_categories = np.empty(n_total, dtype=object)
+        tests = np.empty(n_total, dtype=object)
+        correlations = np.empty(n_total)
+        p_values = np.empty(n_total)
+        ns = np.empty(n_total, dtype=np.int64)
+        significant = np.empty(n_total, dtype=bool)
+        
+        # Secondo passaggio: riempie le colonne per indice
+        i = 0
         for project_name, results in self.analyzer.correlation_results.items():
-            for category in ['complexity', 'changes', 'bugfixes']:
+            for category in categories:
                 if category in results:
                     for test_name, test_result in results[category].items():
-                        all_correlations.append({
-                            'project': project_name,
-                            'category': category,
-                            'test': test_name,
-                            'correlation': test_result['correlation'],
-                            'p_value': test_result['p_value'],
-                            'n': test_result['n'],
-                            'significant': test_result['significant']
-                        })
+                        projects[i] = project_name
+                        row_categories[i] = category
+                        tests[i] = test_name
+                        correlations[i] = test_result['correlation']
+                        p_values[i] = test_result['p_value']
+                        ns[i] = test_result['n']
+                        significant[i] = test_result['significant']
+                        i += 1
         
-        df_all = pd.DataFrame(all_correlations)
+        df_all = pd.DataFrame({
+            'project': projects,
+            'category': row_categories,
+            'test': tests,
+            'correlation': correlations,
+            'p_value': p_values,
+            'n': ns,
+            'significant': significant
+        })
         
-        if df_all.empty:
-            print("No correlation data available for meta-analysis")
-            return None
-        
-        # Analisi per categoria
+        # Analisi per categoria: tutte le statistiche in un solo groupby
         print("\nMETA-ANALYSIS RESULTS:")
         print("-" * 40)
         
-        for category in ['complexity', 'changes', 'bugfixes']:
-            cat_data = df_all[df_all['category'] == category]
-            if not cat_data.empty:
-                print(f"\n{category.upper()}:")
-                print(f"  Number of tests: {len(cat_data)}")
-                print(f"  Significant results: {sum(cat_data['significant'])} ({sum(cat_data['significant'])/len(cat_data)*100:.1f}%)")
-                print(f"  Mean correlation: {cat_data['correlation'].mean():.3f}")
-                print(f"  Median correlation: {cat_data['correlation'].median():.3f}")
-                print(f"  Std correlation: {cat_data['correlation'].std():.3f}")
-                
-                # Test di consistenza cross-project
-                significant_corrs = cat_data[cat_data['significant']]['correlation']
-                if len(significant_corrs) > 1:
-                    consistency = (significant_corrs > 0).sum() / len(significant_corrs)
-                    print(f"  Direction consistency: {consistency:.2f} ({'positive' if consistency > 0.5 else 'negative' if consistency < 0.5 else 'mixed'})")
+        summary = df_all.assign(
+            significant_positive=df_all['significant'] & (df_all['correlation'] > 0)
+        ).groupby('category', sort=False).agg(
+            n_tests=('correlation', 'size'),
+            n_significant=('significant', 'sum'),
+            mean=('correlation', 'mean'),
+            median=('correlation', 'median'),
+            std=('correlation', 'std'),
+            n_significant_positive=('significant_positive', 'sum')
+        )
+        summary = summary.loc[[c for c in categories if c in summary.index]]
+        
+        for row in summary.itertuples():
+            print(f"\n{row.Index.upper()}:")
+            print(f"  Number of tests: {row.n_tests}")
+            print(f"  Significant results: {row.n_significant} ({row.n_significant/row.n_tests*100:.1f}%)")
+            print(f"  Mean correlation: {row.mean:.3f}")
+            print(f"  Median correlation: {row.median:.3f}")
+            print(f"  Std correlation: {row.std:.3f}")
+            
+            # Test di consistenza cross-project
+            if row.n_significant > 1:
+                consistency = row.n_significant_positive / row.n_significant
+                print(f"  Direction consistency: {consistency:.2f} ({'positive' if consistency > 0.5 else 'negative' if consistency < 0.5 else 'mixed'})")
         
         self.cross_project_results = df_all
         return df_all
     
-    def smell_type_specific_analysis(self):
+    def smell_type_specific_analysis(self, detailed=False):
         """
         Analizza correlazioni specifiche per tipo di smell
         Utile se hai diversi tipi di ML code smells
+        detailed: costruisce anche il DataFrame dei commit, base per l'analisi per tipo (non ancora implementata)
         """
         print("\n=== SMELL TYPE-SPECIFIC ANALYSIS ===")
         
         for project_name in self.analyzer.projects_data.keys():
-            commit_data = self.analyzer.projects_data[project_name]['commit_metrics']
             evolution_data = self.analyzer.projects_data[project_name]['smell_evolution']
             
             print(f"\nProject: {project_name}")
@@ -150,8 +229,10 @@ class AdvancedMLCSAnalysis:
                     print(f"  {smell_type}: {total} total, {active} active")
                 
                 # Per ogni tipo di smell, analizza le correlazioni
-                df = pd.DataFrame(commit_data)
-                df['date'] = pd.to_datetime(df['date'])
+                # (commit_metrics non c'è per i progetti caricati dal workflow: resta nei worker di caricamento)
+                if detailed:
+                    df = pd.DataFrame(self.analyzer.projects_data[project_name]['commit_metrics'])
+                    df['date'] = pd.to_datetime(df['date'])
                 
                 # Crea aggregazione per tipo di smell se disponibile
                 # (questo richiederebbe una struttura dati più dettagliata)
@@ -173,8 +254,8 @@ class AdvancedMLCSAnalysis:
             
             # Dividi in due metà temporali
             mid_point = len(data) // 2
-            first_half = data.iloc[:mid_point]
-            second_half = data.iloc[mid_point:]
+            first_half = np.arange(len(data)) < mid_point
+            second_half = ~first_half
             
             # Test chiave correlazioni per stabilità
             test_pairs = [
@@ -182,45 +263,34 @@ class AdvancedMLCSAnalysis:
                 ('total_smells_found_sum', 'change_intensity'),
                 ('smell_density_mean', 'bugfix_ratio')
             ]
+            pairs = [(x_var, y_var) for x_var, y_var in test_pairs
+                     if x_var in data.columns and y_var in data.columns]
             
-            for x_var, y_var in test_pairs:
-                if x_var in data.columns and y_var in data.columns:
-                    
-                    # Prima metà
-                    if len(first_half) > 3:
-                        x1 = first_half[x_var].dropna()
-                        y1 = first_half[y_var].dropna()
-                        if len(x1) > 2 and len(y1) > 2:
-                            min_len1 = min(len(x1), len(y1))
-                            r1, p1 = spearmanr(x1[:min_len1], y1[:min_len1])
-                        else:
-                            r1, p1 = np.nan, np.nan
-                    else:
-                        r1, p1 = np.nan, np.nan
-                    
-                    # Seconda metà
-                    if len(second_half) > 3:
-                        x2 = second_half[x_var].dropna()
-                        y2 = second_half[y_var].dropna()
-                        if len(x2) > 2 and len(y2) > 2:
-                            min_len2 = min(len(x2), len(y2))
-                            r2, p2 = spearmanr(x2[:min_len2], y2[:min_len2])
-                        else:
-                            r2, p2 = np.nan, np.nan
-                    else:
-                        r2, p2 = np.nan, np.nan
-                    
-                    if not (np.isnan(r1) or np.isnan(r2)):
-                        stability = abs(r1 - r2)
-                        print(f"  {x_var} vs {y_var}:")
-                        print(f"    First half: r={r1:.3f}, p={p1:.3f}")
-                        print(f"    Second half: r={r2:.3f}, p={p2:.3f}")
-                        print(f"    Stability (diff): {stability:.3f} {'STABLE' if stability < 0.3 else 'UNSTABLE'}")
+            # Prima e seconda metà: un solo calcolo per metà su tutte le coppie
+            half_results = [self._rank_correlations(project_name, pairs, half, half, min_n=3)
+                            if half.sum() > 3 else {} for half in (first_half, second_half)]
+            
+            for x_var, y_var in pairs:
+                r1, p1, _ = half_results[0].get((x_var, y_var), (np.nan, np.nan, 0))
+                r2, p2, _ = half_results[1].get((x_var, y_var), (np.nan, np.nan, 0))
+                
+                if not (np.isnan(r1) or np.isnan(r2)):
+                    stability = abs(r1 - r2)
+                    print(f"  {x_var} vs {y_var}:")
+                    print(f"    First half: r={r1:.3f}, p={p1:.3f}")
+                    print(f"    Second half: r={r2:.3f}, p={p2:.3f}")
+                    print(f"    Stability (diff): {stability:.3f} {'STABLE' if stability < 0.3 else 'UNSTABLE'}")
     
     def create_advanced_visualizations(self, export_dir=""):
         """
         Crea visualizzazioni avanzate per l'analisi
         """
+        # Import pesanti solo quando servono; backend Agg: i grafici vengono solo salvati su file
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         # 1. Heatmap delle correlazioni cross-project
         if hasattr(self, 'cross_project_results') and not self.cross_project_results.empty:
             
@@ -249,26 +319,27 @@ class AdvancedMLCSAnalysis:
             
             fig, axes = plt.subplots(1, 3, figsize=(18, 6))
             categories = ['complexity', 'changes', 'bugfixes']
+            # Un solo partizionamento per categoria invece di un filtro booleano per ciascuna
+            category_groups = dict(list(self.cross_project_results.groupby('category', sort=False)))
             
             for i, category in enumerate(categories):
-                cat_data = self.cross_project_results[
-                    self.cross_project_results['category'] == category
-                ]
+                cat_data = category_groups.get(category)
                 
-                if not cat_data.empty:
-                    y_pos = range(len(cat_data))
-                    correlations = cat_data['correlation']
+                if cat_data is not None:
+                    y_pos = np.arange(len(cat_data))
+                    correlations = cat_data['correlation'].to_numpy()
                     
-                    # Color by significance
-                    colors = ['red' if sig else 'gray' for sig in cat_data['significant']]
+                    # Color by significance: uno scatter per gruppo invece di un colore per punto
+                    sig_mask = cat_data['significant'].to_numpy(dtype=bool)
                     
-                    axes[i].scatter(correlations, y_pos, c=colors, alpha=0.7)
+                    axes[i].scatter(correlations[sig_mask], y_pos[sig_mask], c='red', alpha=0.7)
+                    axes[i].scatter(correlations[~sig_mask], y_pos[~sig_mask], c='gray', alpha=0.7)
                     axes[i].axvline(x=0, color='black', linestyle='--', alpha=0.5)
                     axes[i].set_xlabel('Correlation Coefficient')
                     axes[i].set_ylabel('Study')
                     axes[i].set_title(f'{category.title()} Correlations')
                     axes[i].set_yticks(y_pos)
-                    axes[i].set_yticklabels([f"{row['project'][:8]}..." for _, row in cat_data.iterrows()])
+                    axes[i].set_yticklabels(cat_data['project'].str[:8].add('...').to_numpy())
             
             plt.tight_layout()
             if export_dir:
@@ -284,9 +355,9 @@ class AdvancedMLCSAnalysis:
         """
         # Export lag analysis
         if self.lag_analysis_results:
-            with open(f"{filename_prefix}_lag_analysis.json", 'w') as f:
-                import json
-                json.dump(self.lag_analysis_results, f, indent=2, default=str)
+            # Correlazioni NaN restano NaN anche con orjson installato: vedi dumps_json
+            with open(f"{filename_prefix}_lag_analysis.json", 'wb') as f:
+                f.write(dumps_json(self.lag_analysis_results))
         
         # Export cross-project results
         if hasattr(self, 'cross_project_results') and not self.cross_project_results.empty:
@@ -10,12 +10,59 @@ Usage:
     python fix_date_format.py
 """
 
-import json
 import os
-from pathlib import Path
-from datetime import datetime
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import pandas as pd
 
+from json_io import dumps_json, load_json
+
+# Parser JSON in streaming opzionale: senza, si legge l'intero file
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+def _dump_json(data, path):
+    """
+    Scrive un file JSON indentato (orjson se disponibile; json se i dati contengono NaN/Infinity, vedi dumps_json).
+    Scrive su un file temporaneo e lo sostituisce con os.replace: un'interruzione non lascia mai il file a metà
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_json(data))
+    os.replace(tmp_path, path)
+
+def _peek_commits(path, n):
+    """
+    Restituisce i primi n commit; con ijson li legge in streaming senza parsare tutto il file
+    ijson non accetta NaN/Infinity (che json e dumps_json scrivono): in quel caso si legge l'intero file
+    """
+    if ijson is not None:
+        try:
+            with open(path, 'rb') as f:
+                return list(islice(ijson.items(f, 'item', use_float=True), n))
+        except ijson.JSONError:
+            pass
+    return load_json(path)[:n]
+
+def _iter_projects(data_dir):
+    """
+    Scorre le directory dei progetti con os.scandir (tipo di entry già noto da readdir)
+    Restituisce (nome, directory, path di commit_metrics.json o None se manca)
+    """
+    with os.scandir(data_dir) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            commit_file = os.path.join(entry.path, "commit_metrics.json")
+            try:
+                os.stat(commit_file)
+            except OSError:
+                commit_file = None
+            yield entry.name, entry.path, commit_file
+
 def inspect_date_formats(data_dir="data"):
     """
     Ispeziona i formati delle date in tutti i progetti
@@ -23,110 +70,117 @@ def inspect_date_formats(data_dir="data"):
     print("🔍 INSPECTING DATE FORMATS...")
     print("=" * 50)
     
-    data_path = Path(data_dir)
-    
-    for project_dir in data_path.iterdir():
-        if project_dir.is_dir():
-            commit_file = project_dir / "commit_metrics.json"
+    for project_name, project_dir, commit_file in _iter_projects(data_dir):
+        if commit_file is not None:
+            print(f"\n📁 Project: {project_name}")
             
-            if commit_file.exists():
-                print(f"\n📁 Project: {project_dir.name}")
+            try:
+                # Servono solo le prime 3 date: niente parsing dell'intero file
+                commit_data = _peek_commits(commit_file, 3)
                 
-                try:
-                    with open(commit_file, 'r', encoding='utf-8') as f:
-                        commit_data = json.load(f)
+                if commit_data and len(commit_data) > 0:
+                    # Esamina le prime 3 date
+                    for i, commit in enumerate(commit_data):
+                        if 'date' in commit:
+                            date_value = commit['date']
+                            print(f"   Sample date {i+1}: '{date_value}' (type: {type(date_value).__name__})")
+                            
+                            # Prova a fare il parsing
+                            try:
+                                parsed_date = pd.to_datetime(date_value)
+                                print(f"   ✅ Pandas parsing: SUCCESS -> {parsed_date}")
+                            except Exception as e:
+                                print(f"   ❌ Pandas parsing: FAILED -> {str(e)}")
+                        else:
+                            print(f"   ⚠️  No 'date' field in commit {i+1}")
+                else:
+                    print("   ⚠️  Empty commit data")
                     
-                    if commit_data and len(commit_data) > 0:
-                        # Esamina le prime 3 date
-                        print(f"   Total commits: {len(commit_data)}")
-                        
-                        for i, commit in enumerate(commit_data[:3]):
-                            if 'date' in commit:
-                                date_value = commit['date']
-                                print(f"   Sample date {i+1}: '{date_value}' (type: {type(date_value).__name__})")
-                                
-                                # Prova a fare il parsing
-                                try:
-                                    parsed_date = pd.to_datetime(date_value)
-                                    print(f"   ✅ Pandas parsing: SUCCESS -> {parsed_date}")
-                                except Exception as e:
-                                    print(f"   ❌ Pandas parsing: FAILED -> {str(e)}")
-                            else:
-                                print(f"   ⚠️  No 'date' field in commit {i+1}")
-                    else:
-                        print("   ⚠️  Empty commit data")
-                        
-                except Exception as e:
-                    print(f"   ❌ Error reading file: {str(e)}")
+            except Exception as e:
+                print(f"   ❌ Error reading file: {str(e)}")
+        else:
+            print(f"   ⚠️  No commit_metrics.json found")
+
+def _fix_one_project(project_dir, commit_file, backup):
+    """
+    Corregge le date di un singolo progetto (eseguita in un processo worker)
+    Non stampa nulla: restituisce (ok, date corrette, messaggi) al processo principale
+    """
+    messages = []
+    
+    try:
+        # Leggi i dati originali
+        commit_data = load_json(commit_file)
+        
+        # Backup se richiesto: copia byte per byte dell'originale, non una riserializzazione
+        if backup:
+            backup_file = os.path.join(project_dir, "commit_metrics_backup.json")
+            shutil.copyfile(commit_file, backup_file)
+            messages.append(f"   💾 Backup created: {os.path.basename(backup_file)}")
+        
+        # Correggi le date: un solo parsing vettoriale per tutto il file.
+        # Le date di git sono quasi sempre ISO 8601 (parser veloce senza inferenza);
+        # solo le righe rimaste NaT passano dal parser 'mixed', molto più lento
+        to_fix = [commit for commit in commit_data if isinstance(commit.get('date'), str)]
+        raw_dates = pd.Series([commit['date'] for commit in to_fix], dtype=object)
+        parsed_dates = pd.to_datetime(raw_dates, utc=True, errors='coerce', format='ISO8601')
+        not_iso = parsed_dates.isna()
+        if not_iso.any():
+            parsed_dates[not_iso] = pd.to_datetime(raw_dates[not_iso], utc=True, errors='coerce', format='mixed')
+        parsed_dates = pd.DatetimeIndex(parsed_dates)
+        
+        # Converti in formato ISO standard (UTC)
+        iso_dates = parsed_dates.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        failed = parsed_dates.isna()
+        
+        for commit, iso_date, is_failed in zip(to_fix, iso_dates, failed):
+            if is_failed:
+                messages.append(f"   ⚠️  Failed to fix date '{commit['date']}': unrecognized format")
             else:
-                print(f"   ⚠️  No commit_metrics.json found")
+                commit['date'] = iso_date
+        
+        fixed_count = len(to_fix) - int(failed.sum())
+        
+        # Salva i dati corretti
+        _dump_json(commit_data, commit_file)
+        
+        return True, fixed_count, messages
+        
+    except Exception as e:
+        messages.append(f"   ❌ Failed to process: {str(e)}")
+        return False, 0, messages
 
 def fix_date_formats(data_dir="data", backup=True):
     """
     Corregge automaticamente i formati delle date
+    I progetti sono indipendenti: vengono elaborati in parallelo, uno per processo
     """
     print("\n🔧 FIXING DATE FORMATS...")
     print("=" * 50)
     
-    data_path = Path(data_dir)
     fixed_projects = []
     failed_projects = []
     
-    for project_dir in data_path.iterdir():
-        if project_dir.is_dir():
-            commit_file = project_dir / "commit_metrics.json"
+    projects = [(name, project_dir, commit_file)
+                for name, project_dir, commit_file in _iter_projects(data_dir)
+                if commit_file is not None]
+    names, project_dirs, commit_files = zip(*projects) if projects else ((), (), ())
+    
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(_fix_one_project, project_dirs, commit_files,
+                               [backup] * len(projects), chunksize=4)
+        
+        # Output nell'ordine dei progetti, a prescindere da quale worker finisce prima
+        for project_name, (ok, fixed_count, messages) in zip(names, results):
+            print(f"\n📁 Processing: {project_name}")
+            for message in messages:
+                print(message)
             
-            if commit_file.exists():
-                print(f"\n📁 Processing: {project_dir.name}")
-                
-                try:
-                    # Leggi i dati originali
-                    with open(commit_file, 'r', encoding='utf-8') as f:
-                        commit_data = json.load(f)
-                    
-                    # Backup se richiesto
-                    if backup:
-                        backup_file = project_dir / "commit_metrics_backup.json"
-                        with open(backup_file, 'w', encoding='utf-8') as f:
-                            json.dump(commit_data, f, indent=2)
-                        print(f"   💾 Backup created: {backup_file.name}")
-                    
-                    # Correggi le date
-                    fixed_count = 0
-                    for commit in commit_data:
-                        if 'date' in commit:
-                            original_date = commit['date']
-                            
-                            try:
-                                # Prova diversi formati
-                                if isinstance(original_date, str):
-                                    # Formato ISO standard
-                                    if 'T' in original_date:
-                                        parsed_date = pd.to_datetime(original_date, utc=True)
-                                    else:
-                                        # Altri formati comuni
-                                        parsed_date = pd.to_datetime(original_date)
-                                    
-                                    # Converti in formato ISO standard
-                                    commit['date'] = parsed_date.strftime('%Y-%m-%dT%H:%M:%S%z')
-                                    if not commit['date'].endswith('+00:00') and not commit['date'].endswith('Z'):
-                                        commit['date'] = parsed_date.strftime('%Y-%m-%dT%H:%M:%S+00:00')
-                                    
-                                    fixed_count += 1
-                                    
-                            except Exception as e:
-                                print(f"   ⚠️  Failed to fix date '{original_date}': {str(e)}")
-                    
-                    # Salva i dati corretti
-                    with open(commit_file, 'w', encoding='utf-8') as f:
-                        json.dump(commit_data, f, indent=2)
-                    
-                    print(f"   ✅ Fixed {fixed_count} dates")
-                    fixed_projects.append(project_dir.name)
-                    
-                except Exception as e:
-                    print(f"   ❌ Failed to process: {str(e)}")
-                    failed_projects.append(project_dir.name)
+            if ok:
+                print(f"   ✅ Fixed {fixed_count} dates")
+                fixed_projects.append(project_name)
+            else:
+                failed_projects.append(project_name)
     
     print(f"\n📊 SUMMARY:")
     print(f"   ✅ Fixed projects: {len(fixed_projects)}")
@@ -144,35 +198,29 @@ def test_pandas_parsing(data_dir="data"):
     print("\n🧪 TESTING PANDAS PARSING...")
     print("=" * 50)
     
-    data_path = Path(data_dir)
-    
-    for project_dir in data_path.iterdir():
-        if project_dir.is_dir():
-            commit_file = project_dir / "commit_metrics.json"
+    for project_name, project_dir, commit_file in _iter_projects(data_dir):
+        if commit_file is not None:
+            print(f"\n📁 Testing: {project_name}")
             
-            if commit_file.exists():
-                print(f"\n📁 Testing: {project_dir.name}")
+            try:
+                commit_data = _peek_commits(commit_file, 5)
                 
-                try:
-                    with open(commit_file, 'r', encoding='utf-8') as f:
-                        commit_data = json.load(f)
-                    
-                    # Crea un DataFrame di test
-                    df = pd.DataFrame(commit_data[:5])  # Solo prime 5 righe per test
-                    
-                    # Testa la conversione datetime
-                    df['date'] = pd.to_datetime(df['date'])
-                    df['period'] = df['date'].dt.to_period('M')
-                    
-                    print(f"   ✅ SUCCESS - Pandas parsing works!")
-                    print(f"   Sample parsed dates:")
-                    for i, row in df.iterrows():
-                        print(f"      {row['date']} -> Period: {row['period']}")
-                        if i >= 2:  # Solo prime 3
-                            break
-                    
-                except Exception as e:
-                    print(f"   ❌ FAILED - {str(e)}")
+                # Crea un DataFrame di test
+                df = pd.DataFrame(commit_data)  # Solo prime 5 righe per test
+                
+                # Testa la conversione datetime
+                df['date'] = pd.to_datetime(df['date'])
+                df['period'] = df['date'].dt.to_period('M')
+                
+                print(f"   ✅ SUCCESS - Pandas parsing works!")
+                print(f"   Sample parsed dates:")
+                for i, row in df.iterrows():
+                    print(f"      {row['date']} -> Period: {row['period']}")
+                    if i >= 2:  # Solo prime 3
+                        break
+                
+            except Exception as e:
+                print(f"   ❌ FAILED - {str(e)}")
 
 def main():
     """
@@ -0,0 +1,74 @@
+"""
+Lettura/scrittura JSON condivisa da workflow, analyzer e date fixer
+orjson se disponibile, altrimenti (o per dati con NaN/Infinity) il modulo json della libreria standard
+"""
+
+import json
+import math
+import mmap
+
+# Parser JSON veloce opzionale: senza, si ricade sulla libreria standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def load_json(path):
+    """
+    Legge un file JSON (orjson se disponibile)
+    Con orjson il parsing avviene direttamente sulle pagine mappate con mmap, senza copiare il file in un buffer
+    """
+    with open(path, 'rb') as f:
+        if orjson is not None:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                mapped = None  # file vuoto: non mappabile
+            try:
+                if mapped is None:
+                    return orjson.loads(b'')
+                with mapped, memoryview(mapped) as view:
+                    return orjson.loads(view)
+            except orjson.JSONDecodeError:
+                f.seek(0)  # es. NaN/Infinity, accettati solo dal modulo json
+        return json.loads(f.read())
+
+def _has_non_finite(data):
+    """True se data contiene float NaN/Infinity (anche numpy), a qualsiasi livello di dict/list/tuple"""
+    import numpy as np  # import lazy: chi si limita a leggere JSON non carica numpy
+    if isinstance(data, dict):
+        return any(_has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(value) for value in data)
+    if isinstance(data, (float, np.floating)):
+        return not math.isfinite(data)
+    if isinstance(data, np.ndarray) and data.dtype.kind in 'fc':
+        return not np.isfinite(data).all()
+    return False
+
+def _json_default(obj):
+    """Oggetti non JSON nativi: numpy come valori Python (come OPT_SERIALIZE_NUMPY), il resto come str"""
+    import numpy as np
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+def dumps_json(data, indent=True):
+    """
+    Serializza data in bytes JSON, indentato (2 spazi) o compatto.
+    orjson scriverebbe NaN/Infinity come null: con valori non finiti si usa sempre il modulo json,
+    che li scrive come NaN/Infinity (e load_json li rilegge), così il file non dipende da quale
+    libreria è installata. Testo UTF-8, numpy e datetime trattati allo stesso modo in entrambi i casi
+    """
+    if orjson is not None and not _has_non_finite(data):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_json_default, option=option)
+    if indent:
+        text = json.dumps(data, indent=2, ensure_ascii=False, default=_json_default)
+    else:
+        text = json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_json_default)
+    return text.encode('utf-8')
@@ -26,34 +26,226 @@ Date: 2025-06-14
 """
 
 import os
+import io
 import sys
-import json
 import logging
+import logging.handlers
+import contextlib
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-import matplotlib.pyplot as plt
-import matplotlib.figure as Figure
 
-# Import delle classi di analisi
-from ml_cs_analyzer import MLCodeSmellCorrelationAnalyzer
-from advanced_analyzer import AdvancedMLCSAnalysis
+from json_io import dumps_json, load_json
 
 # Setup logging
+# Il file di log passa da un MemoryHandler: i record vengono scritti a blocchi (o subito da ERROR in su)
+# invece di un write+flush per ogni record. L'handler di destinazione va formattato esplicitamente
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_log_file_handler = logging.FileHandler('analysis.log')
+_log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_log_file_buffer = logging.handlers.MemoryHandler(capacity=1000, flushLevel=logging.ERROR,
+                                                  target=_log_file_handler)
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
-        logging.FileHandler('analysis.log'),
+        _log_file_buffer,
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+# File che ogni progetto deve contenere
+REQUIRED_FILES = (
+    'commit_metrics.json',
+    'file_frequencies.json',
+    'smell_evolution.json'
+)
+_REQUIRED_FILES_SET = frozenset(REQUIRED_FILES)
+
+# Campi che ogni commit di commit_metrics.json deve contenere
+REQUIRED_COMMIT_FIELDS = (
+    'commit_hash', 'date', 'total_smells_found', 'smell_density',
+    'project_cyclomatic_complexity', 'files_changed', 'is_bug_fix'
+)
+_REQUIRED_COMMIT_FIELDS_SET = frozenset(REQUIRED_COMMIT_FIELDS)
+
+def _copy_file(src, dst):
+    """
+    Copia un file nel kernel con os.copy_file_range (reflink copy-on-write su btrfs/XFS),
+    con fallback su shutil.copy. Niente hardlink: il log continua a crescere nelle esecuzioni
+    successive e la copia esportata deve restare una fotografia di questa analisi
+    """
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining > 0:
+            raise OSError("copy_file_range copied fewer bytes than expected")
+    except (AttributeError, OSError):
+        import shutil
+        shutil.copy(src, dst)
+
+def _starts_with_array(path, chunk_size=64):
+    """
+    Legge solo i primi byte del file: True se il primo carattere significativo è '[' (array JSON)
+    """
+    with open(path, 'rb') as f:
+        chunk = f.read(chunk_size)
+        if chunk.startswith(b'\xef\xbb\xbf'):  # BOM UTF-8
+            chunk = chunk[3:]
+        while chunk:
+            head = chunk.lstrip(b' \t\r\n')
+            if head:
+                return head[:1] == b'['
+            chunk = f.read(chunk_size)
+    return False
+
+def _load_one(project_dir):
+    """
+    Carica e valida i tre file JSON di un progetto (eseguita anche nei processi worker)
+    Non scrive nel log: restituisce (nome, dati o None, messaggi) al processo principale
+    """
+    project_name = project_dir.name
+    messages = []
+    
+    try:
+        # Paths dei file
+        commit_file, freq_file, evolution_file = (project_dir / name for name in REQUIRED_FILES)
+        
+        # Carica i dati (smell_evolution è piccolo e serve alla validazione)
+        evolution_data = load_json(evolution_file)
+        
+        # Valida i dati prima dei parsing costosi: se commit_metrics.json non inizia con '['
+        # non è una lista e non serve parsarlo.
+        # file_frequencies.json non entra nella validazione: si legge solo per un progetto valido
+        if not _starts_with_array(commit_file):
+            _validate_data(project_name, None, evolution_data, messages)
+            return project_name, None, messages
+        commit_data = load_json(commit_file)
+        if not _validate_data(project_name, commit_data, evolution_data, messages):
+            return project_name, None, messages
+        
+        freq_data = load_json(freq_file)
+        
+        return project_name, {
+            'commit_metrics': commit_data,
+            'file_frequencies': freq_data,
+            'smell_evolution': evolution_data
+        }, messages
+        
+    except Exception as e:
+        messages.append((logging.ERROR, f"Failed to load project {project_name}: {str(e)}"))
+        return project_name, None, messages
+
+def _load_and_aggregate_indexed(item):
+    """
+    Carica, valida e aggrega un progetto nel worker (per imap_unordered: conserva la posizione del progetto)
+    commit_metrics resta nel worker: rispedirlo via pickle costerebbe quanto il parsing,
+    al processo principale basta il DataFrame aggregato (poche decine o centinaia di righe)
+    Restituisce (indice, (nome, dati senza commit_metrics o None, messaggi), dati aggregati o None)
+    """
+    index, project_dir, time_window = item
+    project_name, project_data, messages = _load_one(project_dir)
+    if project_data is None:
+        return index, (project_name, None, messages), None
+    
+    try:
+        from ml_cs_analyzer import MLCodeSmellCorrelationAnalyzer
+        analyzer = MLCodeSmellCorrelationAnalyzer({project_name: project_data})
+        aggregated_data = analyzer.aggregate_data_by_time(project_name, time_window)
+    except Exception as e:
+        messages.append((logging.ERROR, f"Failed to aggregate data for project {project_name}: {str(e)}"))
+        return index, (project_name, None, messages), None
+    
+    project_data = {key: value for key, value in project_data.items() if key != 'commit_metrics'}
+    return index, (project_name, project_data, messages), aggregated_data
+
+def _validate_data(project_name, commit_data, evolution_data, messages):
+    """
+    Valida la struttura e qualità dei dati
+    I messaggi di log vengono accodati a messages come (livello, testo)
+    """
+    try:
+        # Valida commit_data
+        if not isinstance(commit_data, list) or len(commit_data) == 0:
+            messages.append((logging.ERROR, f"{project_name}: commit_metrics deve essere una lista non vuota"))
+            return False
+        
+        # Verifica campi richiesti nel primo commit: test di inclusione in C,
+        # la lista ordinata dei mancanti serve solo in caso di errore
+        first_commit = commit_data[0]
+        commit_keys = first_commit.keys() if isinstance(first_commit, dict) else ()
+        
+        if not _REQUIRED_COMMIT_FIELDS_SET.issubset(commit_keys):
+            missing_fields = [field for field in REQUIRED_COMMIT_FIELDS if field not in commit_keys]
+            messages.append((logging.ERROR, f"{project_name}: Missing required fields in commit_metrics: {missing_fields}"))
+            return False
+        
+        # Valida evolution_data
+        if 'summary' not in evolution_data:
+            messages.append((logging.ERROR, f"{project_name}: smell_evolution must have 'summary' field"))
+            return False
+        
+        messages.append((logging.INFO, f"{project_name}: Data validation passed"))
+        return True
+        
+    except Exception as e:
+        messages.append((logging.ERROR, f"{project_name}: Data validation failed: {str(e)}"))
+        return False
+
+def _run_captured(func, *args):
+    """
+    Esegue func in un processo worker catturandone lo stdout, che il processo principale
+    ristampa nell'ordine dei progetti. Restituisce (risultato, output, eccezione o None)
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        try:
+            return func(*args), buffer.getvalue(), None
+        except Exception as e:
+            return None, buffer.getvalue(), e
+
+def _base_analysis_one(project_name, aggregated_data):
+    """
+    Analisi di correlazione base di un singolo progetto a partire dai soli dati aggregati
+    """
+    from ml_cs_analyzer import MLCodeSmellCorrelationAnalyzer
+    
+    analyzer = MLCodeSmellCorrelationAnalyzer({})
+    analyzer.aggregated_data[project_name] = aggregated_data
+    return analyzer.perform_correlation_analysis(project_name)
+
+def _lag_analysis_one(project_name, aggregated_data, max_lag):
+    """
+    Lag correlation analysis di un singolo progetto a partire dai soli dati aggregati
+    """
+    from ml_cs_analyzer import MLCodeSmellCorrelationAnalyzer
+    from advanced_analyzer import AdvancedMLCSAnalysis
+    
+    analyzer = MLCodeSmellCorrelationAnalyzer({})
+    analyzer.aggregated_data[project_name] = aggregated_data
+    return AdvancedMLCSAnalysis(analyzer).lag_correlation_analysis(project_name, max_lag=max_lag)
+
 class MLCSWorkflow:
     """
     Classe principale per orchestrare tutto il workflow di analisi
     """
     
+    # Attributi fissi: niente __dict__ per istanza, accesso agli attributi più rapido
+    __slots__ = (
+        'data_dir', 'output_dir', 'time_window',
+        '_base_analyzer', 'advanced_analyzer',
+        'processed_projects', 'failed_projects', 'project_figures'
+    )
+    
     def __init__(self, data_dir="data", output_dir="results", time_window='M'):
         """
         Inizializza il workflow
@@ -70,8 +262,8 @@ class MLCSWorkflow:
         # Crea directory di output se non esiste
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        # Inizializza analyzers
-        self.base_analyzer = MLCodeSmellCorrelationAnalyzer({})
+        # Analyzers creati al primo uso (vedi base_analyzer)
+        self._base_analyzer = None
         self.advanced_analyzer = None
         
         # Traccia progetti processati
@@ -81,6 +273,17 @@ class MLCSWorkflow:
         
         logger.info(f"Workflow initialized with data_dir={data_dir}, output_dir={output_dir}")
     
+    @property
+    def base_analyzer(self):
+        """
+        Analyzer base, creato al primo accesso: l'import di ml_cs_analyzer (pandas/scipy/matplotlib/seaborn)
+        avviene solo dopo che discover_projects ha trovato dei progetti da caricare
+        """
+        if self._base_analyzer is None:
+            from ml_cs_analyzer import MLCodeSmellCorrelationAnalyzer
+            self._base_analyzer = MLCodeSmellCorrelationAnalyzer({})
+        return self._base_analyzer
+    
     def discover_projects(self):
         """
         Scopre automaticamente i progetti nella directory data
@@ -94,23 +297,24 @@ class MLCSWorkflow:
             logger.error(f"Data directory {self.data_dir} does not exist!")
             return projects
         
-        for item in self.data_dir.iterdir():
-            if item.is_dir():
-                # Verifica che abbia i file richiesti
-                required_files = [
-                    'commit_metrics.json',
-                    'file_frequencies.json', 
-                    'smell_evolution.json'
-                ]
+        # os.scandir: il tipo di entry arriva già da readdir, e un solo listdir per progetto
+        # sostituisce un controllo di esistenza per ogni file richiesto
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
                 
-                has_all_files = all((item / file).exists() for file in required_files)
+                try:
+                    names = set(os.listdir(entry.path))
+                except OSError:
+                    names = set()
                 
-                if has_all_files:
-                    projects.append(item.name)
-                    logger.info(f"Found project: {item.name}")
+                if _REQUIRED_FILES_SET.issubset(names):
+                    projects.append(entry.name)
+                    logger.info(f"Found project: {entry.name}")
                 else:
-                    missing_files = [f for f in required_files if not (item / f).exists()]
-                    logger.warning(f"Project {item.name} missing files: {missing_files}")
+                    missing_files = [f for f in REQUIRED_FILES if f not in names]
+                    logger.warning(f"Project {entry.name} missing files: {missing_files}")
         
         logger.info(f"Discovered {len(projects)} valid projects")
         return projects
@@ -125,76 +329,50 @@ class MLCSWorkflow:
         Returns:
             bool: True se caricamento riuscito, False altrimenti
         """
-        try:
-            project_dir = self.data_dir / project_name
-            
-            # Paths dei file
-            commit_file = project_dir / 'commit_metrics.json'
-            freq_file = project_dir / 'file_frequencies.json'
-            evolution_file = project_dir / 'smell_evolution.json'
-            
-            # Carica i dati
-            with open(commit_file, 'r', encoding='utf-8') as f:
-                commit_data = json.load(f)
-            
-            with open(freq_file, 'r', encoding='utf-8') as f:
-                freq_data = json.load(f)
-            
-            with open(evolution_file, 'r', encoding='utf-8') as f:
-                evolution_data = json.load(f)
-            
-            # Valida i dati
-            if not self._validate_data(project_name, commit_data, freq_data, evolution_data):
-                return False
-            
-            # Salva nel base analyzer
-            self.base_analyzer.projects_data[project_name] = {
-                'commit_metrics': commit_data,
-                'file_frequencies': freq_data,
-                'smell_evolution': evolution_data
-            }
-            
-            logger.info(f"Successfully loaded data for project: {project_name}")
-            return True
+        return self._store_project_data(_load_one(self.data_dir / project_name))
+    
+    def load_all_projects(self, projects):
+        """
+        Carica e aggrega i dati di tutti i progetti in parallelo, un processo per progetto
+        (il parsing JSON è CPU-bound: con i thread il GIL lo serializzerebbe).
+        I worker restituiscono solo i dati aggregati: commit_metrics non arriva nel processo principale
+        
+        Args:
+            projects (list): Nomi dei progetti da caricare
             
-        except Exception as e:
-            logger.error(f"Failed to load project {project_name}: {str(e)}")
-            return False
+        Returns:
+            list: Progetti il cui caricamento è fallito
+        """
+        items = [(index, self.data_dir / project, self.time_window) for index, project in enumerate(projects)]
+        results = [None] * len(projects)
+        
+        with multiprocessing.Pool(processes=min(os.cpu_count() or 1, len(projects))) as pool:
+            for index, result, aggregated_data in pool.imap_unordered(_load_and_aggregate_indexed, items, chunksize=4):
+                results[index] = (result, aggregated_data)
+        
+        # Inserimento e log nell'ordine di discovery, a prescindere da quale worker finisce prima
+        failed = []
+        for project, (result, aggregated_data) in zip(projects, results):
+            if self._store_project_data(result):
+                self.base_analyzer.aggregated_data[project] = aggregated_data
+            else:
+                failed.append(project)
+        return failed
     
-    def _validate_data(self, project_name, commit_data, freq_data, evolution_data):
+    def _store_project_data(self, result):
         """
-        Valida la struttura e qualità dei dati
+        Riporta nel log i messaggi del caricamento e salva i dati nel base analyzer
         """
-        try:
-            # Valida commit_data
-            if not isinstance(commit_data, list) or len(commit_data) == 0:
-                logger.error(f"{project_name}: commit_metrics deve essere una lista non vuota")
-                return False
-            
-            # Verifica campi richiesti nel primo commit
-            required_fields = [
-                'commit_hash', 'date', 'total_smells_found', 'smell_density',
-                'project_cyclomatic_complexity', 'files_changed', 'is_bug_fix'
-            ]
-            
-            first_commit = commit_data[0]
-            missing_fields = [field for field in required_fields if field not in first_commit]
-            
-            if missing_fields:
-                logger.error(f"{project_name}: Missing required fields in commit_metrics: {missing_fields}")
-                return False
-            
-            # Valida evolution_data
-            if 'summary' not in evolution_data:
-                logger.error(f"{project_name}: smell_evolution must have 'summary' field")
-                return False
-            
-            logger.info(f"{project_name}: Data validation passed")
-            return True
-            
-        except Exception as e:
-            logger.error(f"{project_name}: Data validation failed: {str(e)}")
+        project_name, project_data, messages = result
+        for level, message in messages:
+            logger.log(level, message)
+        
+        if project_data is None:
             return False
+        
+        self.base_analyzer.projects_data[project_name] = project_data
+        logger.info(f"Successfully loaded data for project: {project_name}")
+        return True
     
     def run_base_analysis(self):
         """
@@ -203,30 +381,53 @@ class MLCSWorkflow:
         logger.info("Starting base correlation analysis...")
         
         successful_projects = []
+        project_names = list(self.base_analyzer.projects_data.keys())
+        aggregation_errors = {}
         
-        for project_name in self.base_analyzer.projects_data.keys():
-            try:
+        # load_all_projects aggrega già nei worker; i progetti caricati con load_project_data si aggregano qui
+        for project_name in project_names:
+            if project_name not in self.base_analyzer.aggregated_data:
+                try:
+                    self.base_analyzer.aggregate_data_by_time(project_name, self.time_window)
+                except Exception as e:
+                    aggregation_errors[project_name] = e
+        
+        # Progetti indipendenti: uno per processo, ciascuno riceve solo i propri dati aggregati
+        # (niente processo per chi ha meno di 3 periodi: l'analisi non si esegue)
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(project_names) or 1)) as executor:
+            futures = {project_name: executor.submit(_run_captured, _base_analysis_one, project_name,
+                                                     self.base_analyzer.aggregated_data[project_name])
+                       for project_name in project_names
+                       if project_name not in aggregation_errors
+                       and len(self.base_analyzer.aggregated_data[project_name]) >= 3}
+            
+            # Consolidamento nell'ordine dei progetti
+            for project_name in project_names:
                 logger.info(f"Processing project: {project_name}")
-                
-                # Aggrega i dati per finestra temporale
-                aggregated_data = self.base_analyzer.aggregate_data_by_time(project_name, self.time_window)
-                
-                if len(aggregated_data) < 3:
-                    logger.warning(f"{project_name}: Insufficient data points ({len(aggregated_data)}) for correlation analysis")
+                try:
+                    if project_name in aggregation_errors:
+                        raise aggregation_errors[project_name]
+                    
+                    if project_name not in futures:
+                        aggregated_data = self.base_analyzer.aggregated_data[project_name]
+                        logger.warning(f"{project_name}: Insufficient data points ({len(aggregated_data)}) for correlation analysis")
+                        self.failed_projects.append(project_name)
+                        continue
+                    
+                    correlation_results, output, error = futures[project_name].result()
+                    sys.stdout.write(output)
+                    if error is not None:
+                        raise error
+                    
+                    self.base_analyzer.correlation_results[project_name] = correlation_results
+                    successful_projects.append(project_name)
+                    self.processed_projects.append(project_name)
+                    
+                    logger.info(f"Completed base analysis for: {project_name}")
+                    
+                except Exception as e:
+                    logger.error(f"Failed base analysis for {project_name}: {str(e)}")
                     self.failed_projects.append(project_name)
-                    continue
-                
-                # Esegui analisi di correlazione
-                correlation_results = self.base_analyzer.perform_correlation_analysis(project_name)
-
-                successful_projects.append(project_name)
-                self.processed_projects.append(project_name)
-                
-                logger.info(f"Completed base analysis for: {project_name}")
-                
-            except Exception as e:
-                logger.error(f"Failed base analysis for {project_name}: {str(e)}")
-                self.failed_projects.append(project_name)
         
         logger.info(f"Base analysis completed. Success: {len(successful_projects)}, Failed: {len(self.failed_projects)}")
         return successful_projects
@@ -242,13 +443,22 @@ class MLCSWorkflow:
         logger.info("Starting advanced analysis...")
         
         # Inizializza advanced analyzer
+        from advanced_analyzer import AdvancedMLCSAnalysis
         self.advanced_analyzer = AdvancedMLCSAnalysis(self.base_analyzer)
         
         try:
             # 1. Lag correlation analysis
             logger.info("Running lag correlation analysis...")
-            for project in self.processed_projects:
-                self.advanced_analyzer.lag_correlation_analysis(project, max_lag=3)
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(self.processed_projects))) as executor:
+                futures = [executor.submit(_run_captured, _lag_analysis_one, project,
+                                           self.base_analyzer.aggregated_data[project], 3)
+                           for project in self.processed_projects]
+                for project, future in zip(self.processed_projects, futures):
+                    lag_results, output, error = future.result()
+                    sys.stdout.write(output)
+                    if error is not None:
+                        raise error
+                    self.advanced_analyzer.lag_analysis_results[project] = lag_results
             
             # 2. Cross-project meta-analysis
             logger.info("Running cross-project meta-analysis...")
@@ -274,23 +484,31 @@ class MLCSWorkflow:
         logger.info("Generating final report...")
         
         try:
-            # Generate summary report
-            print("\n" + "="*80)
-            print("FINAL ANALYSIS REPORT")
-            print("="*80)
-            print(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"Time Window: {self.time_window}")
-            print(f"Total Projects Analyzed: {len(self.processed_projects)}")
-            print(f"Failed Projects: {len(self.failed_projects)}")
-            
-            if self.failed_projects:
-                print(f"Failed Projects List: {', '.join(self.failed_projects)}")
-            
-            # Base analysis summary
-            self.base_analyzer.generate_summary_report()
-            
-            # Research questions answers
-            self._answer_research_questions()
+            # Il report viene composto in memoria e scritto su stdout con una sola write
+            # (anche se fallisce a metà, la parte già prodotta precede il log dell'errore)
+            report = io.StringIO()
+            try:
+                with contextlib.redirect_stdout(report):
+                    # Generate summary report
+                    print("\n" + "="*80)
+                    print("FINAL ANALYSIS REPORT")
+                    print("="*80)
+                    print(f"Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    print(f"Time Window: {self.time_window}")
+                    print(f"Total Projects Analyzed: {len(self.processed_projects)}")
+                    print(f"Failed Projects: {len(self.failed_projects)}")
+                    
+                    if self.failed_projects:
+                        print(f"Failed Projects List: {', '.join(self.failed_projects)}")
+                    
+                    # Base analysis summary
+                    self.base_analyzer.generate_summary_report()
+                    
+                    # Research questions answers
+                    self._answer_research_questions()
+            finally:
+                sys.stdout.write(report.getvalue())
+                sys.stdout.flush()
             
             logger.info("Final report generated successfully")
             
@@ -310,83 +528,49 @@ class MLCSWorkflow:
             print("No correlation results available for analysis")
             return
         
-        # Question 1: ML-CSs vs Complexity
-        print("\n1. Is the presence of ML-CSs correlated with code complexity increase over time?")
-        print("-" * 70)
-        
-        complexity_results = []
-        for project, results in self.base_analyzer.correlation_results.items():
-            if 'complexity' in results:
-                for test_name, test_result in results['complexity'].items():
-                    if test_result['significant']:
-                        complexity_results.append({
-                            'project': project,
-                            'correlation': test_result['correlation'],
-                            'p_value': test_result['p_value']
-                        })
-        
-        if complexity_results:
-            avg_correlation = sum(r['correlation'] for r in complexity_results) / len(complexity_results)
-            significant_count = len(complexity_results)
-            total_projects = len(self.processed_projects)
-            
-            print(f"ANSWER: YES - Significant correlation found in {significant_count}/{total_projects} projects")
-            print(f"Average correlation coefficient: {avg_correlation:.3f}")
-            print("INTERPRETATION: ML Code Smells are positively correlated with complexity increases")
-        else:
-            print("ANSWER: NO - No significant correlation found between ML-CSs and complexity")
-        
-        # Question 2: ML-CSs vs Changes
-        print("\n2. Is the presence of ML-CSs correlated with change activity increase over time?")
-        print("-" * 70)
-        
-        change_results = []
-        for project, results in self.base_analyzer.correlation_results.items():
-            if 'changes' in results:
-                for test_name, test_result in results['changes'].items():
-                    if test_result['significant']:
-                        change_results.append({
-                            'project': project,
-                            'correlation': test_result['correlation'],
-                            'p_value': test_result['p_value']
-                        })
-        
-        if change_results:
-            avg_correlation = sum(r['correlation'] for r in change_results) / len(change_results)
-            significant_count = len(change_results)
-            total_projects = len(self.processed_projects)
-            
-            print(f"ANSWER: YES - Significant correlation found in {significant_count}/{total_projects} projects")
-            print(f"Average correlation coefficient: {avg_correlation:.3f}")
-            print("INTERPRETATION: ML Code Smells are associated with increased change activity")
-        else:
-            print("ANSWER: NO - No significant correlation found between ML-CSs and change activity")
-        
-        # Question 3: ML-CSs vs Bug Fixes
-        print("\n3. Is the presence of ML-CSs correlated with bug fix commit activities over time?")
-        print("-" * 70)
-        
-        bugfix_results = []
-        for project, results in self.base_analyzer.correlation_results.items():
-            if 'bugfixes' in results:
-                for test_name, test_result in results['bugfixes'].items():
-                    if test_result['significant']:
-                        bugfix_results.append({
-                            'project': project,
-                            'correlation': test_result['correlation'],
-                            'p_value': test_result['p_value']
-                        })
-        
-        if bugfix_results:
-            avg_correlation = sum(r['correlation'] for r in bugfix_results) / len(bugfix_results)
-            significant_count = len(bugfix_results)
-            total_projects = len(self.processed_projects)
+        research_questions = [
+            ('1. Is the presence of ML-CSs correlated with code complexity increase over time?', 'complexity',
+             'ML Code Smells are positively correlated with complexity increases', 'complexity'),
+            ('2. Is the presence of ML-CSs correlated with change activity increase over time?', 'changes',
+             'ML Code Smells are associated with increased change activity', 'change activity'),
+            ('3. Is the presence of ML-CSs correlated with bug fix commit activities over time?', 'bugfixes',
+             'ML Code Smells are associated with increased bug fix activities', 'bug fix activities'),
+        ]
+        categories = [category for _, category, _, _ in research_questions]
+        
+        # Un solo passaggio su tutti i risultati: (id categoria, correlazione) dei test significativi
+        # in buffer contigui, poi conteggi e somme di tutte le categorie con una bincount ciascuno
+        category_ids = array('q')
+        correlations = array('d')
+        for results in self.base_analyzer.correlation_results.values():
+            for category_id, category in enumerate(categories):
+                if category in results:
+                    for test_result in results[category].values():
+                        if test_result['significant']:
+                            category_ids.append(category_id)
+                            correlations.append(test_result['correlation'])
+        
+        import numpy as np
+        category_ids = np.frombuffer(category_ids, dtype=np.int64)
+        significant_counts = np.bincount(category_ids, minlength=len(categories))
+        correlation_sums = np.bincount(category_ids, weights=np.frombuffer(correlations, dtype=np.float64),
+                                       minlength=len(categories))
+        
+        total_projects = len(self.processed_projects)
+        
+        for category_id, (question, category, interpretation, target) in enumerate(research_questions):
+            print(f"\n{question}")
+            print("-" * 70)
             
-            print(f"ANSWER: YES - Significant correlation found in {significant_count}/{total_projects} projects")
-            print(f"Average correlation coefficient: {avg_correlation:.3f}")
-            print("INTERPRETATION: ML Code Smells are associated with increased bug fix activities")
-        else:
-            print("ANSWER: NO - No significant correlation found between ML-CSs and bug fix activities")
+            significant_count = int(significant_counts[category_id])
+            if significant_count:
+                avg_correlation = correlation_sums[category_id] / significant_count
+                
+                print(f"ANSWER: YES - Significant correlation found in {significant_count}/{total_projects} projects")
+                print(f"Average correlation coefficient: {avg_correlation:.3f}")
+                print(f"INTERPRETATION: {interpretation}")
+            else:
+                print(f"ANSWER: NO - No significant correlation found between ML-CSs and {target}")
     
     def export_all_results(self):
         """
@@ -401,9 +585,14 @@ class MLCSWorkflow:
             export_dir.mkdir(exist_ok=True)
             
 
-            # Export visualizations
-            self.base_analyzer.create_visualizations(str(export_dir))
-            self.advanced_analyzer.create_advanced_visualizations(str(export_dir))
+            # Export visualizations: le figure dei progetti sono indipendenti e il rendering Agg è CPU-bound,
+            # quindi vanno nei processi worker mentre il processo principale disegna quelle avanzate
+            plot_jobs = self.base_analyzer.visualization_jobs(str(export_dir))
+            with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(plot_jobs) or 1)) as executor:
+                futures = [executor.submit(plot, *args) for plot, args in plot_jobs]
+                self.advanced_analyzer.create_advanced_visualizations(str(export_dir))
+                for future in futures:
+                    future.result()
 
 
             # Export base analysis results
@@ -424,13 +613,13 @@ class MLCSWorkflow:
                 'total_projects': len(self.processed_projects) + len(self.failed_projects)
             }
             
-            with open(export_dir / "workflow_summary.json", 'w') as f:
-                json.dump(workflow_summary, f, indent=2)
+            # Serializzazione in memoria e una sola scrittura, come gli altri export (vedi dumps_json)
+            (export_dir / "workflow_summary.json").write_bytes(dumps_json(workflow_summary))
             
-            # Copy log file
+            # Copy log file (prima svuota il buffer del log su file)
+            _log_file_buffer.flush()
             if Path('analysis.log').exists():
-                import shutil
-                shutil.copy('analysis.log', export_dir / 'analysis.log')
+                _copy_file('analysis.log', export_dir / 'analysis.log')
             
             logger.info(f"All results exported to: {export_dir}")
             print(f"\n✅ All results exported to: {export_dir}")
@@ -455,10 +644,7 @@ class MLCSWorkflow:
             
             # Step 2: Load all project data
             logger.info("Loading project data...")
-            for project in projects:
-                success = self.load_project_data(project)
-                if not success:
-                    self.failed_projects.append(project)
+            self.failed_projects.extend(self.load_all_projects(projects))
             
             if not self.base_analyzer.projects_data:
                 logger.error("No projects loaded successfully. Exiting.")
@@ -1,14 +1,148 @@
-import json
 import pandas as pd
 import numpy as np
-from scipy.stats import pearsonr, spearmanr, shapiro
+from scipy.stats import shapiro
+import matplotlib
+matplotlib.use('Agg')  # solo salvataggio su file: nessun backend GUI, utilizzabile anche nei processi worker
 import matplotlib.pyplot as plt
 import matplotlib.figure as Figure
 import seaborn as sns
 from datetime import datetime
+from bisect import bisect_right
+from itertools import product
 import warnings
 warnings.filterwarnings('ignore')
 
+# Spearman come Pearson sui ranghi e p-value, condivisi con advanced_analyzer
+from correlation_stats import correlation_pvalues, spearman_fast, subset_ranks
+
+# Lettura/scrittura JSON (orjson se disponibile)
+from json_io import dumps_json, load_json
+
+# Aggregazioni per periodo di aggregate_data_by_time: colonna -> funzioni,
+# nell'ordine delle colonne del risultato (nomi '<colonna>_<funzione>')
+_PERIOD_AGGREGATIONS = {
+    # ML Code Smells metrics
+    'total_smells_found': ['sum', 'mean'],
+    'smell_density': ['mean'],
+    'smells_introduced': ['sum'],
+    'smells_removed': ['sum'],
+    
+    # Complexity metrics
+    'project_cyclomatic_complexity': ['last', 'mean'],
+    'commit_cyclomatic_complexity': ['mean'],
+    
+    # Change metrics
+    'files_changed': ['sum', 'mean'],
+    'LOC_added': ['sum'],
+    'LOC_deleted': ['sum'],
+    
+    # Bug fix metrics
+    'is_bug_fix': ['sum'],
+    'bug_fixing': ['sum']
+}
+
+def _reduce_groups(values, starts, counts, func):
+    """
+    Riduzione 'sum', 'mean' o 'last' di values per blocchi contigui di righe (inizi starts, lunghezze counts)
+    Stessa semantica di groupby.agg: NaN ignorati, somma vuota 0, 'last' = ultimo valore non NaN
+    """
+    if values.dtype.kind == 'b':
+        values = values.astype(np.int64)
+    elif values.dtype.kind not in 'iuf':
+        values = values.astype(np.float64)
+    
+    valid = ~np.isnan(values) if values.dtype.kind == 'f' else None
+    if valid is None or valid.all():
+        # Nessun valore mancante (interi o float completi): 'last' è un gather sull'ultima riga di ogni blocco
+        if func == 'last':
+            return values[starts + counts - 1]
+        sums = np.add.reduceat(values, starts)
+        return sums if func == 'sum' else sums / counts
+    
+    if func == 'last':
+        last = np.maximum.reduceat(np.where(valid, np.arange(len(values)), -1), starts)
+        return np.where(last >= 0, values[last], np.nan)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    if func == 'sum':
+        return sums
+    with np.errstate(invalid='ignore'):
+        return sums / np.add.reduceat(valid.astype(np.int64), starts)
+
+# Sotto questo numero di osservazioni per coppia non si testa la normalità: sempre Spearman
+MIN_NORMALITY_N = 20
+
+def _shapiro_normality(values):
+    """
+    Shapiro-Wilk su un array 1-D già privo di NaN: (normale a p > 0.05, p-value)
+    Servono più di 3 osservazioni, altrimenti (False, 1.0)
+    """
+    if len(values) > 3:
+        stat, p = shapiro(values)
+        return p > 0.05, p
+    return False, 1.0
+
+# Soglie di significatività e relative etichette (p < 0.001 -> '***', ..., altrimenti 'ns')
+_SIGNIFICANCE_THRESHOLDS = (0.001, 0.01, 0.05)
+_SIGNIFICANCE_LABELS = ('***', '**', '*', 'ns')
+
+def _significance_stars(p):
+    """Etichetta di significatività di un p-value (NaN -> 'ns')"""
+    return _SIGNIFICANCE_LABELS[bisect_right(_SIGNIFICANCE_THRESHOLDS, p)]
+
+# Figura 2x3 dei progetti: allocata una volta per processo e riusata da un progetto all'altro
+_project_figure = None
+
+def _plot_project_correlations(project_name, data, output_path):
+    """
+    Figura 2x3 di un progetto, salvata in output_path
+    Funzione di modulo: può essere eseguita in un processo worker
+    """
+    global _project_figure
+    if _project_figure is None:
+        _project_figure = plt.figure(figsize=(18, 12), layout='constrained')
+    fig = _project_figure
+    # Assi ricreati da zero a ogni progetto; il layout è risolto da constrained layout al salvataggio
+    fig.clf()
+    axes = fig.subplots(2, 3)
+    
+    # Colonne estratte una sola volta come ndarray
+    data = {column: data[column].to_numpy() for column in data.columns}
+    fig.suptitle(f'Analisi Correlazione ML Code Smells - {project_name}', fontsize=16)
+
+    # Plot 1: Smell density vs Complexity delta
+    if 'smell_density_mean' in data and 'complexity_delta' in data:
+        axes[0,0].scatter(data['smell_density_mean'], data['complexity_delta'], alpha=0.7)
+        axes[0,0].set(xlabel='Smell Density', ylabel='Complexity Delta', title='Smells vs Complexity Change')
+
+    # Plot 2: Total smells vs Change intensity
+    if 'total_smells_found_sum' in data and 'change_intensity' in data:
+        axes[0,1].scatter(data['total_smells_found_sum'], data['change_intensity'], alpha=0.7)
+        axes[0,1].set(xlabel='Total Smells Found', ylabel='Change Intensity', title='Smells vs Change Activity')
+
+    # Plot 3: Smell density vs Bug fix ratio
+    if 'smell_density_mean' in data and 'bugfix_ratio' in data:
+        axes[0,2].scatter(data['smell_density_mean'], data['bugfix_ratio'], alpha=0.7)
+        axes[0,2].set(xlabel='Smell Density', ylabel='Bug Fix Ratio', title='Smells vs Bug Fixes')
+
+    # Time series plots (period_num assegnato da visualization_jobs)
+
+    # Plot 4: Evolution of smells over time
+    if 'total_smells_found_sum' in data:
+        axes[1,0].plot(data['period_num'], data['total_smells_found_sum'], marker='o')
+        axes[1,0].set(xlabel='Time Period', ylabel='Total Smells', title='Smell Evolution Over Time')
+
+    # Plot 5: Evolution of complexity over time
+    if 'project_cyclomatic_complexity_last' in data:
+        axes[1,1].plot(data['period_num'], data['project_cyclomatic_complexity_last'], marker='o', color='orange')
+        axes[1,1].set(xlabel='Time Period', ylabel='Project Complexity', title='Complexity Evolution Over Time')
+
+    # Plot 6: Bug fix ratio over time
+    if 'bugfix_ratio' in data:
+        axes[1,2].plot(data['period_num'], data['bugfix_ratio'], marker='o', color='red')
+        axes[1,2].set(xlabel='Time Period', ylabel='Bug Fix Ratio', title='Bug Fix Activity Over Time')
+
+    fig.savefig(output_path, dpi=300, bbox_inches='tight')
+
 class MLCodeSmellCorrelationAnalyzer:
     def __init__(self, projects_data):
         """
@@ -17,15 +151,14 @@ class MLCodeSmellCorrelationAnalyzer:
         self.projects_data = projects_data
         self.aggregated_data = {}
         self.correlation_results = {}
+        self._aggregation_cache = {}
+        self._commit_frames = {}
     
     def load_project_data(self, project_name, commit_file, freq_file, evolution_file):
         """Carica i dati di un singolo progetto"""
-        with open(commit_file, 'r') as f:
-            commit_data = json.load(f)
-        with open(freq_file, 'r') as f:
-            freq_data = json.load(f)
-        with open(evolution_file, 'r') as f:
-            evolution_data = json.load(f)
+        commit_data = load_json(commit_file)
+        freq_data = load_json(freq_file)
+        evolution_data = load_json(evolution_file)
         
         self.projects_data[project_name] = {
             'commit_metrics': commit_data,
@@ -33,258 +166,234 @@ class MLCodeSmellCorrelationAnalyzer:
             'smell_evolution': evolution_data
         }
     
+    def _commit_frame(self, project_name):
+        """
+        DataFrame dei commit con le date già convertite, costruito una sola volta per progetto
+        e condiviso dalle aggregazioni su finestre diverse.
+        La cache è legata alla lista commit_metrics da cui è costruita: se projects_data viene
+        aggiornato (anche scrivendolo direttamente, come fa il workflow) il DataFrame viene ricostruito
+        """
+        commits = self.projects_data[project_name]['commit_metrics']
+        cached = self._commit_frames.get(project_name)
+        if cached is None or cached[0] is not commits:
+            df = pd.DataFrame(commits)
+            df['date'] = pd.to_datetime(df['date'])
+            cached = (commits, df)
+            self._commit_frames[project_name] = cached
+        return cached[1]
+    
     def aggregate_data_by_time(self, project_name, window='M'):
         """
         Aggrega i dati per finestre temporali
         window: 'M'=mese, 'Q'=trimestre, 'W'=settimana
+        L'aggregazione viene calcolata una sola volta per (progetto, finestra) e per dati del progetto
+        (stessa lista commit_metrics). Viene restituita una copia: le modifiche a aggregated_data
+        (es. la colonna period_num dei grafici) non alterano la cache
         """
-        commit_data = self.projects_data[project_name]['commit_metrics']
+        commits = self.projects_data[project_name]['commit_metrics']
+        cached = self._aggregation_cache.get((project_name, window))
+        if cached is not None and cached[0] is commits:
+            aggregated = cached[1].copy()
+            self.aggregated_data[project_name] = aggregated
+            return aggregated
+        
+        df = self._commit_frame(project_name)
+        periods = df['date'].dt.to_period(window).array
+        
+        # Righe ordinate per periodo, ordinamento stabile: dentro un periodo resta l'ordine originale
+        # (quello che groupby usa per 'last'); le date mancanti sono escluse come da groupby
+        keep = np.flatnonzero(~periods.isna())
+        codes = periods.asi8[keep]
+        order = keep[np.argsort(codes, kind='stable')]
+        codes = periods.asi8[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.intp)
+        counts = np.diff(np.r_[starts, len(codes)])
         
-        # Converti in DataFrame
-        df = pd.DataFrame(commit_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df['period'] = df['date'].dt.to_period(window)
+        # Aggregazione per periodo: una riduzione per blocchi contigui per colonna
+        columns = {'period': periods[order[starts]]}
+        for column, funcs in _PERIOD_AGGREGATIONS.items():
+            values = df[column].to_numpy()[order]
+            for func in funcs:
+                columns[f'{column}_{func}'] = _reduce_groups(values, starts, counts, func)
+        columns['total_commits'] = counts
         
-        # Aggregazione per periodo
-        aggregated = df.groupby('period').agg({
-            # ML Code Smells metrics
-            'total_smells_found': ['sum', 'mean'],
-            'smell_density': 'mean',
-            'smells_introduced': 'sum',
-            'smells_removed': 'sum',
+        # Metriche derivate direttamente sugli array, prima di costruire il DataFrame
+        complexity = columns['project_cyclomatic_complexity_last'].astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Complessità: incremento nel tempo (diff/shift: il primo periodo non ha precedente)
+            complexity_delta = np.full(len(complexity), np.nan)
+            complexity_delta[1:] = complexity[1:] - complexity[:-1]
+            complexity_growth_rate = np.full(len(complexity), np.nan)
+            complexity_growth_rate[1:] = complexity_delta[1:] / complexity[:-1]
+            columns['complexity_delta'] = complexity_delta
+            columns['complexity_growth_rate'] = complexity_growth_rate
             
-            # Complexity metrics
-            'project_cyclomatic_complexity': ['last', 'mean'],
-            'commit_cyclomatic_complexity': 'mean',
+            # Change intensity
+            columns['change_intensity'] = columns['files_changed_sum'] / counts
+            columns['loc_churn'] = (columns['LOC_added_sum'] + columns['LOC_deleted_sum']) / counts
             
-            # Change metrics
-            'files_changed': ['sum', 'mean'],
-            'LOC_added': 'sum',
-            'LOC_deleted': 'sum',
+            # Bug fix ratio
+            columns['bugfix_commits'] = columns['is_bug_fix_sum'] + columns['bug_fixing_sum']
+            columns['bugfix_ratio'] = columns['bugfix_commits'] / counts
             
-            # Bug fix metrics
-            'is_bug_fix': 'sum',
-            'bug_fixing': 'sum'
-        }).reset_index()
-        
-        # Flattening colonne multi-level
-        aggregated.columns = ['_'.join(col).strip() if col[1] else col[0] for col in aggregated.columns.values]
-        aggregated.rename(columns={'period_': 'period'}, inplace=True)
-        
-        # Calcola metriche derivate
-        total_commits = df.groupby('period').size().reset_index(name='total_commits')
-        aggregated = aggregated.merge(total_commits, on='period')
-        
-        # Complessità: incremento nel tempo
-        aggregated['complexity_delta'] = aggregated['project_cyclomatic_complexity_last'].diff()
-        aggregated['complexity_growth_rate'] = aggregated['complexity_delta'] / aggregated['project_cyclomatic_complexity_last'].shift(1)
-        
-        # Change intensity
-        aggregated['change_intensity'] = aggregated['files_changed_sum'] / aggregated['total_commits']
-        aggregated['loc_churn'] = (aggregated['LOC_added_sum'] + aggregated['LOC_deleted_sum']) / aggregated['total_commits']
+            # ML-CS evolution metrics
+            columns['smell_introduction_rate'] = columns['smells_introduced_sum'] / counts
+            columns['smell_removal_rate'] = columns['smells_removed_sum'] / counts
+            columns['net_smell_change'] = columns['smells_introduced_sum'] - columns['smells_removed_sum']
         
-        # Bug fix ratio
-        aggregated['bugfix_commits'] = aggregated['is_bug_fix_sum'] + aggregated['bug_fixing_sum']
-        aggregated['bugfix_ratio'] = aggregated['bugfix_commits'] / aggregated['total_commits']
-        
-        # ML-CS evolution metrics
-        aggregated['smell_introduction_rate'] = aggregated['smells_introduced_sum'] / aggregated['total_commits']
-        aggregated['smell_removal_rate'] = aggregated['smells_removed_sum'] / aggregated['total_commits']
-        aggregated['net_smell_change'] = aggregated['smells_introduced_sum'] - aggregated['smells_removed_sum']
+        aggregated = pd.DataFrame(columns)
         
+        self._aggregation_cache[(project_name, window)] = (commits, aggregated)
+        aggregated = aggregated.copy()
         self.aggregated_data[project_name] = aggregated
         return aggregated
     
     def test_normality(self, data, variable):
         """Test di normalità Shapiro-Wilk"""
-        clean_data = data[variable].dropna()
-        if len(clean_data) > 3:
-            stat, p = shapiro(clean_data)
-            return p > 0.05, p
-        return False, 1.0
+        return _shapiro_normality(data[variable].dropna().to_numpy())
+    
+    def _cached_normality(self, cache, variable, values, mask):
+        """
+        Test di normalità sulle righe mask di variable (values: la sua colonna come ndarray, senza DataFrame intermedi),
+        memoizzato in cache per (variabile, maschera). La cache vive per una sola analisi
+        """
+        key = (variable, mask.tobytes())
+        result = cache.get(key)
+        if result is None:
+            result = _shapiro_normality(values[mask])
+            cache[key] = result
+        return result
     
     def perform_correlation_analysis(self, project_name):
         """Esegue l'analisi di correlazione per un progetto"""
         data = self.aggregated_data[project_name]
         results = {}
+        # Shapiro-Wilk per (variabile, righe usate): la stessa metrica ricorre in molte coppie
+        normality_cache = {}
         
-        # Domanda 1: ML-CSs vs Complessità del codice
-        print(f"\n=== PROGETTO: {project_name} ===")
-        print("\n1. CORRELAZIONE: ML Code Smells vs Complessità del Codice")
-        
-        # Diverse metriche di smell vs complessità
+        # Diverse metriche di smell vs complessità, change e bug fix
         smell_metrics = ['smell_density_mean', 'total_smells_found_sum', 'smell_introduction_rate']
         complexity_metrics = ['complexity_delta', 'complexity_growth_rate', 'project_cyclomatic_complexity_last']
+        change_metrics = ['change_intensity', 'files_changed_sum', 'loc_churn']
+        bugfix_metrics = ['bugfix_ratio', 'bugfix_commits']
         
-        complexity_results = {}
-        for sm in smell_metrics:
-            for cm in complexity_metrics:
-                if sm in data.columns and cm in data.columns:
-                    x = data[sm].dropna()
-                    y = data[cm].dropna()
-                    
-                    # Assicurati che abbiano la stessa lunghezza
-                    common_idx = data[sm].notna() & data[cm].notna()
-                    x = data.loc[common_idx, sm]
-                    y = data.loc[common_idx, cm]
-                    
-                    if len(x) > 3:
-                        # Test normalità
-                        x_normal, x_p = self.test_normality(pd.DataFrame({sm: x}), sm)
-                        y_normal, y_p = self.test_normality(pd.DataFrame({cm: y}), cm)
-                        
-                        # Scegli il test appropriato
-                        if x_normal and y_normal:
-                            r, p = pearsonr(x, y)
-                            test_used = "Pearson"
-                        else:
-                            r, p = spearmanr(x, y)
-                            test_used = "Spearman"
-                        
-                        complexity_results[f"{sm}_vs_{cm}"] = {
-                            'correlation': r,
-                            'p_value': p,
-                            'test': test_used,
-                            'n': len(x),
-                            'significant': p < 0.05
-                        }
-                        
-                        print(f"  {sm} vs {cm}:")
-                        print(f"    {test_used}: r={r:.3f}, p={p:.3f}, n={len(x)} {'***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else 'ns'}")
-        
-        results['complexity'] = complexity_results
+        # Solo le metriche presenti nei dati, filtrate una volta per tutte le coppie
+        present = set(data.columns)
+        smell_metrics, complexity_metrics, change_metrics, bugfix_metrics = (
+            [m for m in group if m in present]
+            for group in (smell_metrics, complexity_metrics, change_metrics, bugfix_metrics))
         
-        # Domanda 2: ML-CSs vs Numero di change
-        print("\n2. CORRELAZIONE: ML Code Smells vs Attività di Change")
+        # Tutte le correlazioni in blocco: per ogni coppia contano le sole righe valorizzate
+        # in entrambe le colonne, come nei test per coppia
+        metrics = list(dict.fromkeys(smell_metrics + complexity_metrics + change_metrics + bugfix_metrics))
+        sub = data[metrics]
+        # Layout per colonne: arr[i] è la metrica i come array contiguo, indicizzata per posizione
+        # (maschere e conteggi per coppia senza indicizzazione pandas per etichetta)
+        arr = np.ascontiguousarray(sub.to_numpy(dtype=np.float64).T)
+        valid = ~np.isnan(arr)
+        pair_n = valid.astype(np.float64) @ valid.T
         
-        change_metrics = ['change_intensity', 'files_changed_sum', 'loc_churn']
-        change_results = {}
+        # Spearman come Pearson sui ranghi: ogni metrica viene ordinata una sola volta e tutti i ranghi,
+        # per tutti e tre i blocchi, si ricavano da quell'ordinamento.
+        # Metriche con gli stessi NaN: ranghi sulle righe valorizzate e un solo corrcoef per gruppo
+        orders = np.argsort(arr, axis=1, kind='stable')
+        spearman_r = np.full(pair_n.shape, np.nan)
+        same_nans = {}
+        for i, row_mask in enumerate(valid):
+            same_nans.setdefault(row_mask.tobytes(), []).append(i)
+        for members in same_nans.values():
+            rows = valid[members[0]]
+            if rows.sum() > 1:
+                ranks = np.array([subset_ranks(arr[i], orders[i], rows) for i in members])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    spearman_r[np.ix_(members, members)] = np.corrcoef(ranks)
         
-        for sm in smell_metrics:
-            for chm in change_metrics:
-                if sm in data.columns and chm in data.columns:
-                    common_idx = data[sm].notna() & data[chm].notna()
-                    x = data.loc[common_idx, sm]
-                    y = data.loc[common_idx, chm]
-                    
-                    if len(x) > 3:
-                        x_normal, _ = self.test_normality(pd.DataFrame({sm: x}), sm)
-                        y_normal, _ = self.test_normality(pd.DataFrame({chm: y}), chm)
-                        
-                        if x_normal and y_normal:
-                            r, p = pearsonr(x, y)
-                            test_used = "Pearson"
-                        else:
-                            r, p = spearmanr(x, y)
-                            test_used = "Spearman"
-                        
-                        change_results[f"{sm}_vs_{chm}"] = {
-                            'correlation': r,
-                            'p_value': p,
-                            'test': test_used,
-                            'n': len(x),
-                            'significant': p < 0.05
-                        }
-                        
-                        print(f"  {sm} vs {chm}:")
-                        print(f"    {test_used}: r={r:.3f}, p={p:.3f}, n={len(x)} {'***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else 'ns'}")
+        # Coppie con NaN diversi: ranghi ricalcolati sulle righe comuni
+        different_nans = (valid[:, None, :] != valid[None, :, :]).any(axis=2)
+        for i, j in zip(*np.nonzero(np.triu(different_nans, k=1))):
+            common = valid[i] & valid[j]
+            n = int(pair_n[i, j])
+            spearman_r[i, j] = spearman_r[j, i] = (
+                spearman_fast(subset_ranks(arr[i], orders[i], common),
+                              subset_ranks(arr[j], orders[j], common), n)
+                if n > 3 else np.nan)
         
-        results['changes'] = change_results
+        pearson_r = sub.corr(method='pearson').to_numpy()
+        correlations = {
+            'pearson': (pearson_r, correlation_pvalues(pearson_r, pair_n)),
+            'spearman': (spearman_r, correlation_pvalues(spearman_r, pair_n))
+        }
+        position = {m: i for i, m in enumerate(metrics)}
         
-        # Domanda 3: ML-CSs vs Bug fix activities
-        print("\n3. CORRELAZIONE: ML Code Smells vs Bug Fix Activities")
+        # Le tre domande di ricerca (ML-CSs vs complessità, change e bug fix):
+        # (chiave dei risultati, intestazione, metriche confrontate con gli smell)
+        blocks = [
+            ('complexity', "1. CORRELAZIONE: ML Code Smells vs Complessità del Codice", complexity_metrics),
+            ('changes', "2. CORRELAZIONE: ML Code Smells vs Attività di Change", change_metrics),
+            ('bugfixes', "3. CORRELAZIONE: ML Code Smells vs Bug Fix Activities", bugfix_metrics)
+        ]
         
-        bugfix_metrics = ['bugfix_ratio', 'bugfix_commits']
-        bugfix_results = {}
+        # Righe dell'output raccolte e scritte con un'unica print alla fine
+        lines = [f"\n=== PROGETTO: {project_name} ==="]
         
-        for sm in smell_metrics:
-            for bm in bugfix_metrics:
-                if sm in data.columns and bm in data.columns:
-                    common_idx = data[sm].notna() & data[bm].notna()
-                    x = data.loc[common_idx, sm]
-                    y = data.loc[common_idx, bm]
-                    
-                    if len(x) > 3:
-                        x_normal, _ = self.test_normality(pd.DataFrame({sm: x}), sm)
-                        y_normal, _ = self.test_normality(pd.DataFrame({bm: y}), bm)
-                        
-                        if x_normal and y_normal:
-                            r, p = pearsonr(x, y)
-                            test_used = "Pearson"
-                        else:
-                            r, p = spearmanr(x, y)
-                            test_used = "Spearman"
-                        
-                        bugfix_results[f"{sm}_vs_{bm}"] = {
-                            'correlation': r,
-                            'p_value': p,
-                            'test': test_used,
-                            'n': len(x),
-                            'significant': p < 0.05
-                        }
-                        
-                        print(f"  {sm} vs {bm}:")
-                        print(f"    {test_used}: r={r:.3f}, p={p:.3f}, n={len(x)} {'***' if p < 0.001 else '**' if p < 0.01 else '*' if p < 0.05 else 'ns'}")
+        for category, header, partner_metrics in blocks:
+            lines.append(f"\n{header}")
+            
+            category_results = {}
+            for sm, other in product(smell_metrics, partner_metrics):
+                # Solo le righe valorizzate in entrambe le colonne
+                i, j = position[sm], position[other]
+                n = int(pair_n[i, j])
+                if n <= 3:
+                    continue
+                common = valid[i] & valid[j]
+                
+                # Test normalità, poi il test appropriato. Con pochi periodi Shapiro-Wilk è poco affidabile:
+                # si usa direttamente Spearman, che non assume la normalità
+                if n < MIN_NORMALITY_N:
+                    x_normal = y_normal = False
+                else:
+                    x_normal, _ = self._cached_normality(normality_cache, sm, arr[i], common)
+                    y_normal, _ = self._cached_normality(normality_cache, other, arr[j], common)
+                method, test_used = ('pearson', "Pearson") if x_normal and y_normal else ('spearman', "Spearman")
+                r_matrix, p_matrix = correlations[method]
+                r, p = r_matrix[i, j], p_matrix[i, j]
+                
+                category_results[f"{sm}_vs_{other}"] = {
+                    'correlation': r,
+                    'p_value': p,
+                    'test': test_used,
+                    'n': n,
+                    'significant': bool(p < 0.05)
+                }
+                
+                lines.append(f"  {sm} vs {other}:")
+                lines.append(f"    {test_used}: r={r:.3f}, p={p:.3f}, n={n} {_significance_stars(p)}")
+            
+            results[category] = category_results
         
-        results['bugfixes'] = bugfix_results
+        print("\n".join(lines))
         
         self.correlation_results[project_name] = results
         return results
     
-    def create_visualizations(self, export_dir = ""):
-        """Crea visualizzazioni per l'analisi"""
+    def visualization_jobs(self, export_dir=""):
+        """
+        Una coppia (funzione, argomenti) per ogni figura da produrre:
+        create_visualizations le esegue in sequenza, il workflow le distribuisce su più processi
+        """
+        jobs = []
         for project_name, data in self.aggregated_data.items():
-            fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-            fig.suptitle(f'Analisi Correlazione ML Code Smells - {project_name}', fontsize=16)
-
-            # Plot 1: Smell density vs Complexity delta
-            if 'smell_density_mean' in data.columns and 'complexity_delta' in data.columns:
-                axes[0,0].scatter(data['smell_density_mean'], data['complexity_delta'], alpha=0.7)
-                axes[0,0].set_xlabel('Smell Density')
-                axes[0,0].set_ylabel('Complexity Delta')
-                axes[0,0].set_title('Smells vs Complexity Change')
-
-            # Plot 2: Total smells vs Change intensity
-            if 'total_smells_found_sum' in data.columns and 'change_intensity' in data.columns:
-                axes[0,1].scatter(data['total_smells_found_sum'], data['change_intensity'], alpha=0.7)
-                axes[0,1].set_xlabel('Total Smells Found')
-                axes[0,1].set_ylabel('Change Intensity')
-                axes[0,1].set_title('Smells vs Change Activity')
-
-            # Plot 3: Smell density vs Bug fix ratio
-            if 'smell_density_mean' in data.columns and 'bugfix_ratio' in data.columns:
-                axes[0,2].scatter(data['smell_density_mean'], data['bugfix_ratio'], alpha=0.7)
-                axes[0,2].set_xlabel('Smell Density')
-                axes[0,2].set_ylabel('Bug Fix Ratio')
-                axes[0,2].set_title('Smells vs Bug Fixes')
-
             # Time series plots
             data['period_num'] = range(len(data))
-
-            # Plot 4: Evolution of smells over time
-            if 'total_smells_found_sum' in data.columns:
-                axes[1,0].plot(data['period_num'], data['total_smells_found_sum'], marker='o')
-                axes[1,0].set_xlabel('Time Period')
-                axes[1,0].set_ylabel('Total Smells')
-                axes[1,0].set_title('Smell Evolution Over Time')
-
-            # Plot 5: Evolution of complexity over time
-            if 'project_cyclomatic_complexity_last' in data.columns:
-                axes[1,1].plot(data['period_num'], data['project_cyclomatic_complexity_last'], marker='o', color='orange')
-                axes[1,1].set_xlabel('Time Period')
-                axes[1,1].set_ylabel('Project Complexity')
-                axes[1,1].set_title('Complexity Evolution Over Time')
-
-            # Plot 6: Bug fix ratio over time
-            if 'bugfix_ratio' in data.columns:
-                axes[1,2].plot(data['period_num'], data['bugfix_ratio'], marker='o', color='red')
-                axes[1,2].set_xlabel('Time Period')
-                axes[1,2].set_ylabel('Bug Fix Ratio')
-                axes[1,2].set_title('Bug Fix Activity Over Time')
-
-            plt.tight_layout()
-            plt.savefig(f'{export_dir}/{project_name}_correlation_analysis.png', dpi=300, bbox_inches='tight')
-            plt.close(fig)
+            jobs.append((_plot_project_correlations,
+                         (project_name, data, f'{export_dir}/{project_name}_correlation_analysis.png')))
+        return jobs
+    
+    def create_visualizations(self, export_dir = ""):
+        """Crea visualizzazioni per l'analisi"""
+        for plot, args in self.visualization_jobs(export_dir):
+            plot(*args)
     
     def generate_summary_report(self):
         """Genera un report riassuntivo per tutti i progetti"""
@@ -313,9 +422,12 @@ class MLCodeSmellCorrelationAnalyzer:
             if all_results:
                 df_results = pd.DataFrame(all_results)
                 
+                # Conteggio dei significativi una sola volta, a livello numpy
+                n_significant = int(df_results['significant'].to_numpy(dtype=bool).sum())
+                
                 print(f"Total tests performed: {len(df_results)}")
-                print(f"Significant correlations (p<0.05): {sum(df_results['significant'])}")
-                print(f"Significant percentage: {sum(df_results['significant'])/len(df_results)*100:.1f}%")
+                print(f"Significant correlations (p<0.05): {n_significant}")
+                print(f"Significant percentage: {n_significant/len(df_results)*100:.1f}%")
                 
                 # Strongest correlations per category
                 for category in ['complexity', 'changes', 'bugfixes']:
@@ -328,8 +440,9 @@ class MLCodeSmellCorrelationAnalyzer:
     def export_results(self, filename_prefix="ml_cs_correlation"):
         """Esporta i risultati in formato JSON e CSV"""
         # Export correlations as JSON
-        with open(f"{filename_prefix}_results.json", 'w') as f:
-            json.dump(self.correlation_results, f, indent=2, default=str)
+        # NaN (es. correlazioni di serie costanti) restano NaN anche con orjson installato: vedi dumps_json
+        with open(f"{filename_prefix}_results.json", 'wb') as f:
+            f.write(dumps_json(self.correlation_results))
         
         # Export aggregated data as CSV for each project
         for project_name, data in self.aggregated_data.items():